@@ -1,23 +1,68 @@
+import hashlib
+import logging
 import os
+import re
+import time
+from collections import OrderedDict
 from typing import Dict, List, Optional
 from dotenv import load_dotenv
 from model_config.model_config import ModelConfig
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# environment variables don't change at runtime, so resolve them once at import
+# instead of going back to os.environ on every construction
+INITIAL_PROMPT_FILE_PATH = os.getenv('INITIAL_PROMPT_FILE_PATH')
+
+class ResponseCache:
+    """Small LRU cache with a TTL for full model responses.
+
+    Keys are a SHA-256 of the model id plus the canonicalized prompt, so the
+    exact same question with the same context can be answered without another
+    model round trip.
+    """
+
+    def __init__(self, maxsize=1024, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict() # key -> (expires_at, response)
+
+    @staticmethod
+    def make_key(model_name: str, prompt: str) -> str:
+        # collapse whitespace runs, trim and case-fold so trivially-reworded
+        # duplicates ("What are your hours?" vs "what are your hours ?") hit
+        canonical = re.sub(r"\s+", " ", prompt).strip().casefold()
+        return hashlib.sha256(f"{model_name}|{canonical}".encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, response = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return response
+
+    def set(self, key: str, response: str) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl, response)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
 class AIConfigurator:
     def __init__(self):
         # will hold the current model instance
         self.current_model_instance = None  
 
-        # loading in context
-        self.initial_prompt = ""
-        try:
-            with open(os.getenv('INITIAL_PROMPT_FILE_PATH'), "r") as prompt_file:
-                self.initial_prompt = prompt_file.read()
-        except FileNotFoundError:
-            pass
-        
+        # loading in context, cached on the file's mtime so edits to the prompt file
+        # are picked up without re-reading it on every request
+        self.initial_prompt_path = INITIAL_PROMPT_FILE_PATH
+        self._prompt_cache = {"mtime": 0, "content": ""}
+
         # variables related to keeping track of conversation history and token usage
 
         self.conversation_history = {} # the history received from the client each time and to be used for truncation
@@ -31,6 +76,24 @@ class AIConfigurator:
         self.active_provider_name = ""
         self.active_model_name = ""
 
+        # completed responses, reused only for deterministic (temperature 0)
+        # models where an identical prompt yields an identical answer
+        self.response_cache = ResponseCache()
+
+    @property
+    def initial_prompt(self) -> str:
+        """The system prompt, re-read from disk only when the file's mtime changes."""
+        try:
+            mtime = os.stat(self.initial_prompt_path).st_mtime_ns
+        except (OSError, TypeError): # missing file or unset path means no system prompt
+            return ""
+
+        if mtime != self._prompt_cache["mtime"]:
+            with open(self.initial_prompt_path, "r") as prompt_file:
+                self._prompt_cache = {"mtime": mtime, "content": prompt_file.read()}
+
+        return self._prompt_cache["content"]
+
     def set_model(self, provider_name: str, model_name: str, tokenizer_func, completion_func, use_initial_prompt: bool) -> None:
         """Set the active AI provider based on user input."""
         # we will only execute this whenever the provider and/or the model name is changed
@@ -44,50 +107,45 @@ class AIConfigurator:
                 self.token_limit = model_info[2]
 
             except ValueError as e:
-                print(f"Error: {e}")
+                logger.error("Error: %s", e)
     
     def format_history(self) -> str:
-        result = ""
         user_queries = self.conversation_history["user"]
         bot_responses = self.conversation_history["bot"]
-        
-        threads = list(zip(user_queries, bot_responses))
-        for query, response in threads:
-            result += f"User: {query}\nBot: {response}\n"
-        
-        return result
 
-    def retrieve_response_and_tokens(self, message: str, fetch_response=False) -> Dict[Optional[str], int]:
-        response, tokens = None, None
-        if fetch_response:
-            response = self.get_model_completion(message)
-            tokens = self.current_model_instance.tokenize(response)
-        else:
-            # just tokenize the query if fetch_response is false
-            tokens = self.current_model_instance.tokenize(message)
+        # a single join instead of growing a string turn by turn, which
+        # reallocates the accumulated history on every concatenation
+        return "".join(f"User: {query}\nBot: {response}\n"
+                       for query, response in zip(user_queries, bot_responses))
+
+    def count_tokens(self, message: str) -> int:
+        return self.current_model_instance.tokenize(message)
 
-        return {"response": response, "tokens": tokens}
+    def reconcile_history(self, history: Dict[List[str], List[str]], user_message: str, total_tokens: int) -> int:
+        """Truncate the conversation history if needed and update the token bookkeeping.
 
-    def get_response(self, history: Dict[List[str], List[str]], user_message: str, total_tokens: int):
+        Returns the number of tokens in the current user query. Shared by both the
+        buffered and the streaming response paths.
+        """
         self.tokens_exceeded = False
 
         self.conversation_history = history
         self.used_tokens = total_tokens
 
-        query_tokens = self.retrieve_response_and_tokens(user_message)["tokens"]
+        query_tokens = self.count_tokens(user_message)
 
         if self.conversation_history["user"] and self.conversation_history["bot"]:
             if query_tokens + self.used_tokens >= self.token_limit:
                 self.tokens_exceeded = True
                 current = query_tokens + self.used_tokens
-        
+
                 while current >= self.token_limit:
                     query = self.conversation_history["user"].pop(0)
                     response = self.conversation_history["bot"].pop(0)
-            
-                    q_tokens = self.retrieve_response_and_tokens(query)["tokens"]
-                    res_tokens = self.retrieve_response_and_tokens(response)["tokens"]
-                    history_tokens = self.retrieve_response_and_tokens(self.previous_thread)["tokens"] if self.previous_thread else 0
+
+                    q_tokens = self.count_tokens(query)
+                    res_tokens = self.count_tokens(response)
+                    history_tokens = self.count_tokens(self.previous_thread) if self.previous_thread else 0
 
                     current -= (history_tokens + q_tokens + res_tokens)
                     self.used_tokens -= (history_tokens + q_tokens + res_tokens)
@@ -99,11 +157,13 @@ class AIConfigurator:
                 self.stringified_conversation_history = self.format_history()
 
             else: # we can just update the number of used tokens since it's within limits
-                self.stringified_conversation_history += f"User: {self.conversation_history['user'][-1]}\n"   
-                self.stringified_conversation_history += f"Bot: {self.conversation_history['bot'][-1]}\n"
+                # one concatenation per turn instead of two
+                self.stringified_conversation_history += (
+                    f"User: {self.conversation_history['user'][-1]}\n"
+                    f"Bot: {self.conversation_history['bot'][-1]}\n")
 
                 # include context being passed in also in used token count
-                self.used_tokens += self.retrieve_response_and_tokens(self.stringified_conversation_history)["tokens"]
+                self.used_tokens += self.count_tokens(self.stringified_conversation_history)
         else:
             # reset history each time the page is refreshed(start of a new conversation)
             self.conversation_history = {}
@@ -113,15 +173,57 @@ class AIConfigurator:
             self.tokens_exceeded = False
         
         self.used_tokens += query_tokens # update used tokens with token count for current user query
-
-        result = self.retrieve_response_and_tokens(user_message, True)
-        self.used_tokens += result["tokens"]
-
-        return {"response": result["response"], "usedTokens": self.used_tokens, "updatedHistory": self.conversation_history if self.tokens_exceeded else None}
-    
-    def get_model_completion(self, user_message: str) -> str:
-        return self.current_model_instance.get_completion(
-            self.initial_prompt,
-            user_message,
-            self.stringified_conversation_history
-        )
\ No newline at end of file
+        return query_tokens
+
+    async def get_streaming_response(self, history: Dict[List[str], List[str]], user_message: str, total_tokens: int):
+        """Run the history bookkeeping and yield the model output as it arrives.
+
+        The completion function supplied through set_model must be an async
+        generator yielding text chunks, so in-flight chats stay on the event loop
+        instead of each occupying a worker thread. Each chunk is forwarded as
+        {"delta": text} and once the stream is exhausted a final
+        {"usedTokens": ..., "updatedHistory": ..., "done": True} event is yielded.
+
+        This configurator instance is shared across requests, so everything the
+        generator needs after its first await is captured in locals up front:
+        a concurrent request's reconcile_history overwrites the instance-level
+        bookkeeping, and reading it again later would report the other
+        conversation's numbers in the final event.
+        """
+        self.reconcile_history(history, user_message, total_tokens)
+
+        # per-request snapshot, taken before the first await (reconcile_history
+        # and these reads run atomically on the event loop)
+        model_instance = self.current_model_instance
+        initial_prompt = self.initial_prompt
+        conversation_context = self.stringified_conversation_history
+        conversation_history = self.conversation_history
+        tokens_exceeded = self.tokens_exceeded
+        used_tokens = self.used_tokens
+
+        # only deterministic sampling makes a response safe to replay; anything
+        # with temperature > 0 is expected to vary between calls
+        cacheable = model_instance.default_temperature == 0
+        cache_key = None
+        if cacheable:
+            cache_key = ResponseCache.make_key(
+                self.active_model_name,
+                f"{initial_prompt}|{conversation_context}|{user_message}")
+            cached_response = self.response_cache.get(cache_key)
+            if cached_response is not None:
+                yield {"delta": cached_response}
+                used_tokens += model_instance.tokenize(cached_response)
+                yield {"usedTokens": used_tokens, "updatedHistory": conversation_history if tokens_exceeded else None, "done": True}
+                return
+
+        chunks = [] # accumulate the deltas so the full response is only joined once
+        async for delta in model_instance.get_completion(initial_prompt, user_message, conversation_context):
+            chunks.append(delta)
+            yield {"delta": delta}
+
+        full_response = "".join(chunks)
+        if cacheable:
+            self.response_cache.set(cache_key, full_response)
+        used_tokens += model_instance.tokenize(full_response)
+
+        yield {"usedTokens": used_tokens, "updatedHistory": conversation_history if tokens_exceeded else None, "done": True}
\ No newline at end of file
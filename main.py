@@ -1,23 +1,45 @@
 # main.py
-from fastapi import FastAPI, Request
+from fastapi import Depends, FastAPI, HTTPException, Request
+from fastapi.security import HTTPBasic, HTTPBasicCredentials
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import HTMLResponse, ORJSONResponse, Response, StreamingResponse
 
 from ai_configurator import AIConfigurator
 from message_logger import MessageLogger
 
-from openai import OpenAI
+from openai import AsyncOpenAI
+from pydantic import BaseModel
+import aiofiles
+import httpx
+import orjson
 import tiktoken
 
+import asyncio
+import hashlib
+from functools import lru_cache
+import importlib.util
+import hmac
+import logging
 import os
-from random import sample
-from typing import Optional
+from random import Random
+from typing import Dict, List, Optional
 
-app = FastAPI(debug=True)
+logger = logging.getLogger(__name__)
+
+# orjson serializes response bodies several times faster than the stdlib
+# json encoder, which matters for list-heavy payloads on the event loop;
+# debug mode stays off unless explicitly requested — it builds interactive
+# tracebacks per error and leaks internals
+app = FastAPI(debug=os.getenv("DEBUG", "").lower() in ("1", "true"),
+              default_response_class=ORJSONResponse)
 app.mount("/static", StaticFiles(directory="static"), name="static")
-templates = Jinja2Templates(directory="templates")
+# auto_reload off: Jinja otherwise stat()s the template file on every render to
+# check for edits, which only matters in development (--reload restarts anyway)
+templates = Jinja2Templates(directory="templates", auto_reload=False)
+# compile the chat template at startup; later renders hit Jinja's template cache
+templates.get_template("chat.html")
 
 app.add_middleware(
     CORSMiddleware,
@@ -27,14 +49,52 @@ app.add_middleware(
 )
 
 ai_configurator = AIConfigurator()
-message_logger = MessageLogger()
+# the db path is overridable so tests and deployments can keep the sqlite
+# files out of the working directory
+message_logger = MessageLogger(os.getenv("CHATBOT_DB_PATH", "chatbot.db"))
+
+# one HTTP/2 transport shared by every OpenAI client: concurrent chats multiplex
+# over kept-alive connections instead of each paying a TCP+TLS handshake; the
+# pool size is explicit (and tunable) so the default limit can't silently cap
+# throughput under load
+_http_client = httpx.AsyncClient(
+    http2=True,
+    limits=httpx.Limits(
+        max_connections=int(os.getenv("OPENAI_MAX_CONNECTIONS", "200")),
+        max_keepalive_connections=int(os.getenv("OPENAI_MAX_KEEPALIVE_CONNECTIONS", "100")),
+    ),
+)
+
+# reuse one OpenAI client per API key so TCP/TLS connections and auth state are
+# shared across requests instead of being set up from scratch every call
+_openai_clients = {}
+
+def get_openai_client(api_key: str) -> AsyncOpenAI:
+    if api_key not in _openai_clients:
+        _openai_clients[api_key] = AsyncOpenAI(api_key=api_key, http_client=_http_client)
+    return _openai_clients[api_key]
+
+@app.on_event("shutdown")
+async def close_http_client():
+    # drain the shared pool cleanly instead of leaking an unclosed client session
+    await _http_client.aclose()
+
 with open("suggested-prompts.txt", "r") as new_file:
-    prompt_list = new_file.readlines()
+    prompt_list = tuple(line.strip() for line in new_file if line.strip())
+
+# a dedicated Random instance avoids the global RNG's shared lock under load,
+# and the sample size is fixed at import rather than re-derived per request
+_prompt_rng = Random()
+_num_suggestions = min(3, len(prompt_list))
+
+# cache of resolved callables so each module is only loaded and executed once
+# instead of being re-imported on every request
+_loaded_functions = {}
 
-def call_function_from_file(folder_path, module_name, function_name):
+def call_function_from_file(folder_path, module_name, function_name, *args, **kwargs):
     """
     Use to load a module and call the function from a file in a specific folder.
-    
+
     Example usage:
     folder_path = "/path/to/your/folder"  # Update this path as needed
     module_name = "module"
@@ -44,91 +104,211 @@ def call_function_from_file(folder_path, module_name, function_name):
     result = call_function_from_file(folder_path, module_name, function_name)
     print(result)
     """
+    cache_key = (folder_path, module_name, function_name)
+    if cache_key in _loaded_functions:
+        return _loaded_functions[cache_key](*args, **kwargs)
+
     # Check if the folder exists
     if os.path.exists(folder_path):
-        # Add the folder path to the system path to allow importing
-        import sys
-        sys.path.append(folder_path)
-        
-        # Import the module
-        module = __import__(module_name)
-        
+        # Load the module from its file directly; unlike the old sys.path.append
+        # approach this leaks no state into the global import path
+        spec = importlib.util.spec_from_file_location(
+            module_name, os.path.join(folder_path, f"{module_name}.py"))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+
         # Get the function by name and call it
         func = getattr(module, function_name)
-        return func()
+        _loaded_functions[cache_key] = func
+        return func(*args, **kwargs)
     else:
         return "Folder does not exist."
 
-@app.get("/pre_user_prompt", response_class=JSONResponse)
+@app.get("/pre_user_prompt", response_class=ORJSONResponse)
 async def pre_user_prompt():
     """
     Simulate fetching data from a third-party API before the user sends a prompt.
     This data could be used to give context or information to the user.
     """
-    suggested_prompts = sample(prompt_list, 3)
-    return JSONResponse(suggested_prompts)
+    suggested_prompts = _prompt_rng.sample(prompt_list, _num_suggestions)
+    return ORJSONResponse(suggested_prompts)
 
-@app.get("/post_response", response_class=JSONResponse)
+@app.get("/post_response", response_class=ORJSONResponse)
 async def post_response(keyword: str):
     """
     Fetching additional data from a third-party API or feed after sending a response to the user.
     This could be further reading, sources, or related topics.
     """
-    search_rss_feed = call_function_from_file("modules/buildly-collect", "news-blogs", "search_rss_feed")
     # Get Data from Buildly News Blogs
-    # Search the feed
-    news = search_rss_feed(rss_url = "https://www.buildly.io/news/feed/", keyword = keyword)
-    
-    return JSONResponse(news)
+    # Search the feed; the fetch on a cold feed cache is blocking network I/O,
+    # so it runs in a worker thread instead of on the event loop
+    news = await asyncio.to_thread(
+        call_function_from_file, "modules/buildly-collect", "news-blogs", "search_rss_feed",
+        url="https://www.buildly.io/news/feed/", keyword=keyword)
+
+    return ORJSONResponse(news)
 
 @app.get("/", response_class=HTMLResponse)
 async def chat_view(request: Request):
     # return JSONResponse({"status": "Server is runnning on port 8000"})
     return templates.TemplateResponse("chat.html", {"request": request})
 
-@app.post("/chatbot")
-async def chatbot(request: Request):
-    data = await request.json()
-    user_message, history, tokens = data.get("prompt"), data.get("history"), data.get("tokens")
-
-    llm = "gpt-3.5-turbo" # specify the model you want to use
-    provider = "openai" # specify the provider for this model
-    tokenizer = tiktoken.get_encoding("cl100k_base") # specify the tokenizer to use for this model
-    tokenizer_function = lambda text: len(tokenizer.encode(text)) # specify the tokenizing function to use
-
-    # specify the completion function you'd like to use
-    def completion_function(api_key: str, 
-                   initial_prompt: Optional[str],
-                   user_message: str, 
-                   conversation_history: str, 
-                   max_tokens: int, 
-                   temperature: float,
-                   model_name: str):
-        
-        client = OpenAI(api_key=api_key)
+_security = HTTPBasic()
 
-        try:
-            response = client.chat.completions.create(
-                model=model_name,
-                messages=[
-                    {"role": "system", "content": initial_prompt},
-                    {"role": "user", "content": conversation_history + user_message}
-                ],
-                max_tokens=max_tokens,
-                temperature=temperature,
-            )
-
-            return response.choices[0].message.content.strip()
-        
-        except Exception as e:
-            raise e
+# the expected digests are computed once at import, so each request costs two
+# cheap sha256 hashes of the submitted values plus constant-time comparisons
+_ADMIN_USERNAME_DIGEST = hashlib.sha256(os.getenv("ADMIN_USERNAME", "admin").encode()).digest()
+_admin_password = os.getenv("ADMIN_PASSWORD")
+_ADMIN_PASSWORD_DIGEST = hashlib.sha256(_admin_password.encode()).digest() if _admin_password else None
+
+def verify_admin_credentials(credentials: HTTPBasicCredentials = Depends(_security)):
+    """Guard for admin-only endpoints, configured via ADMIN_USERNAME/ADMIN_PASSWORD."""
+    if _ADMIN_PASSWORD_DIGEST is None:
+        raise HTTPException(status_code=503, detail="Admin credentials are not configured.")
+
+    username_matches = hmac.compare_digest(
+        hashlib.sha256(credentials.username.encode()).digest(), _ADMIN_USERNAME_DIGEST)
+    password_matches = hmac.compare_digest(
+        hashlib.sha256(credentials.password.encode()).digest(), _ADMIN_PASSWORD_DIGEST)
+
+    if not (username_matches and password_matches):
+        raise HTTPException(status_code=401, detail="Invalid credentials.",
+                            headers={"WWW-Authenticate": "Basic"})
+
+class SystemPromptUpdate(BaseModel):
+    prompt: str
+
+@app.get("/system_prompt", response_class=ORJSONResponse,
+         dependencies=[Depends(verify_admin_credentials)])
+async def get_system_prompt():
+    """Return the current system prompt; served from the mtime cache."""
+    return ORJSONResponse({"prompt": ai_configurator.initial_prompt})
+
+@app.post("/system_prompt", dependencies=[Depends(verify_admin_credentials)])
+async def update_system_prompt(body: SystemPromptUpdate):
+    """Replace the system prompt, keeping a backup of the previous one.
+
+    The new content is written to a temp file and swapped in with os.replace so
+    a crash mid-write can never leave a truncated prompt, and all file I/O goes
+    through aiofiles so the event loop isn't blocked.
+    """
+    prompt_path = ai_configurator.initial_prompt_path or "initial-prompt.txt"
+
+    # the cached property means a warm cache costs a stat(), not a full read
+    previous_prompt = ai_configurator.initial_prompt
+    if previous_prompt:
+        async with aiofiles.open(f"{prompt_path}.backup", "w") as backup_file:
+            await backup_file.write(previous_prompt)
+
+    temp_path = f"{prompt_path}.tmp"
+    async with aiofiles.open(temp_path, "w") as temp_file:
+        await temp_file.write(body.prompt)
+        await temp_file.flush()
+        # fileno() is a plain sync accessor on aiofiles handles; only the fsync
+        # itself is blocking and needs the thread hop
+        await asyncio.to_thread(os.fsync, temp_file.fileno())
+    os.replace(temp_path, prompt_path) # atomic on POSIX; mtime cache picks it up
+
+    return ORJSONResponse({"status": "updated"})
+
+class ChatRequest(BaseModel):
+    """Body of a /chatbot call: the query plus the client-held session state."""
+    prompt: str
+    history: Dict[str, List[str]]
+    tokens: int
+
+# the chatbot error payloads never vary, so they are serialized once instead of
+# being re-encoded every time a request fails
+_CHAT_ERROR_BODY = b'{"response": "Sorry... An error occurred."}'
+_CHAT_ERROR_EVENT = orjson.dumps({"error": "Sorry... An error occurred.", "done": True}) + b"\n"
+
+# the model selection, tokenizer and completion function are static per process,
+# so they are defined once here instead of being rebuilt on every /chatbot call
+llm = "gpt-3.5-turbo" # specify the model you want to use
+provider = "openai" # specify the provider for this model
+
+# loading an encoding parses the BPE merges file (and may fetch it over HTTP on
+# a cold cache), so each named encoding is only ever constructed once
+@lru_cache(maxsize=8)
+def get_encoding(name: str):
+    return tiktoken.get_encoding(name)
+
+tokenizer_encoding = "cl100k_base" # specify the tokenizer to use for this model
+
+# specify the tokenizing function to use; the history bookkeeping re-counts the
+# same strings (prior turns, the accumulated thread) on every request, so exact
+# repeats are answered from the cache instead of re-running the BPE encoder.
+# The encoding itself is resolved on first use rather than at import, so a
+# missing tiktoken BPE cache can no longer stall (or fail) worker startup with
+# an HTTP fetch before the server is even listening
+@lru_cache(maxsize=10_000)
+def tokenizer_function(text: str) -> int:
+    return len(get_encoding(tokenizer_encoding).encode(text))
+
+# specify the completion function you'd like to use; awaiting the async client
+# directly keeps each in-flight chat on the event loop instead of pinning a
+# worker thread per request
+async def completion_function(api_key: str,
+               initial_prompt: Optional[str],
+               user_message: str,
+               conversation_history: str,
+               max_tokens: int,
+               temperature: float,
+               model_name: str):
+
+    client = get_openai_client(api_key)
+
+    stream = await client.chat.completions.create(
+        model=model_name,
+        messages=[
+            {"role": "system", "content": initial_prompt},
+            {"role": "user", "content": conversation_history + user_message}
+        ],
+        max_tokens=max_tokens,
+        temperature=temperature,
+        stream=True,
+    )
+
+    async for chunk in stream:
+        delta = chunk.choices[0].delta.content
+        if delta:
+            yield delta
+
+@app.post("/chatbot")
+async def chatbot(body: ChatRequest):
+    # declaring the body as a Pydantic model lets FastAPI validate it with its
+    # compiled parser instead of a manual request.json() plus .get() chains,
+    # and documents the schema in OpenAPI for free
+    user_message, history, tokens = body.prompt, body.history, body.tokens
 
-    message_logger.log_message(user_message)
-    
     try:
         ai_configurator.set_model(provider, llm, tokenizer_function, completion_function, use_initial_prompt=True)
-        chat_response = ai_configurator.get_response(history, user_message, tokens)
-        return chat_response
+        event_stream = ai_configurator.get_streaming_response(history, user_message, tokens)
     except Exception as e:
-        print(f"An error occurred: {e}")
-        return JSONResponse({"response": "Sorry... An error occurred."})
\ No newline at end of file
+        logger.error("An error occurred: %s", e)
+        return Response(content=_CHAT_ERROR_BODY, media_type="application/json")
+
+    async def forward_events():
+        # forward each model delta to the client as soon as it arrives instead of
+        # buffering the full completion, so perceived latency is time-to-first-token
+        bot_chunks = []
+        try:
+            async for event in event_stream:
+                if "delta" in event:
+                    bot_chunks.append(event["delta"])
+                # orjson emits bytes directly, skipping both the slower stdlib
+                # encoder and the str->bytes hop Starlette would otherwise do
+                yield orjson.dumps(event) + b"\n"
+        except Exception as e:
+            # headers are already sent by now, so surface the failure as an event
+            logger.error("An error occurred: %s", e)
+            yield _CHAT_ERROR_EVENT
+        finally:
+            # both sides of the exchange go to the logger's background writer in
+            # one batch; this is just a queue put, so no to_thread hop is needed
+            exchange = [("user", user_message)]
+            if bot_chunks:
+                exchange.append(("bot", "".join(bot_chunks)))
+            message_logger.log_messages(exchange)
+
+    return StreamingResponse(forward_events(), media_type="application/x-ndjson")
\ No newline at end of file
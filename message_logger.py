@@ -1,34 +1,411 @@
+import logging
+import orjson
+import os
+import queue
 import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
 """
 Log messages sent through the chatbot and allow for retrievening them later.
-This is implemented in SQLListe for testing purposes.  Would be better to implement in 
+This is implemented in SQLListe for testing purposes.  Would be better to implement in
 a MongoDB or similar document-based database for scalability.
-
-TODO: Create simple analytics for the chatbot, such as the number of messages sent, the most common messages, etc.
 """
+logger = logging.getLogger(__name__)
+
 class MessageLogger:
+    # how long the unfiltered total count may be served from cache
+    COUNT_CACHE_TTL = 5
+    # analytics don't need to be real-time; recompute at most every five minutes
+    ANALYTICS_CACHE_TTL = 300
+    # recent-history reads may be served from memory briefly between writes
+    HISTORY_CACHE_TTL = 30
+    # cap on queued write batches so a stalled writer can't grow memory unboundedly
+    WRITE_QUEUE_MAXSIZE = 10_000
+    # how many queued batches the writer may fold into one transaction
+    WRITE_COALESCE_LIMIT = 500
+    # room in sqlite3's per-connection prepared-statement cache for every query
+    # this class issues, so none are recompiled on repeat calls
+    STATEMENT_CACHE_SIZE = 512
+
+    _INSERT_SQL = "INSERT INTO messages (sender, message, timestamp) VALUES (?, ?, CURRENT_TIMESTAMP)"
+
     def __init__(self, db_path="chatbot.db"):
         self.db_path = db_path
+        self._count_cache = (0, 0) # (expires_at, count)
+        self._analytics_cache = (0, None) # (expires_at, payload)
+        self._history_cache = {} # limit -> (expires_at, rows), cleared on write
         self._create_table()
+
+        # long-lived read-only connections, handed out round-robin: reads stop
+        # paying connection setup and schema parsing per call, and under WAL
+        # they run concurrently with the writer thread
+        self._read_pool = queue.Queue()
+        for _ in range(min(4, os.cpu_count() or 1)):
+            conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True,
+                                   check_same_thread=False,
+                                   cached_statements=self.STATEMENT_CACHE_SIZE)
+            self._read_pool.put(self._configure(conn))
+
+        # writes go through a background thread so callers only pay a queue put;
+        # the sqlite insert and commit happen off the request path entirely
+        self._write_queue = queue.Queue(maxsize=self.WRITE_QUEUE_MAXSIZE)
+        self._writer_thread = threading.Thread(target=self._process_writes, daemon=True)
+        self._writer_thread.start()
     
+    @staticmethod
+    def _configure(conn):
+        """Apply the standard PRAGMA recipe to a fresh connection.
+
+        WAL lets readers proceed while a commit is in flight and
+        synchronous=NORMAL drops the per-commit fsync without risking
+        corruption in WAL mode; busy_timeout makes concurrent connections
+        wait out a writer's lock instead of failing immediately, and the
+        enlarged page cache keeps the hot end of the table in memory.
+        """
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=5000")
+        conn.execute("PRAGMA cache_size=-20000") # ~20 MB page cache
+        conn.execute("PRAGMA temp_store=MEMORY")
+        return conn
+
+    def _connect(self):
+        return self._configure(sqlite3.connect(
+            self.db_path, cached_statements=self.STATEMENT_CACHE_SIZE))
+
+    @contextmanager
+    def _read_conn(self):
+        """Borrow a pooled read-only connection for the duration of one query."""
+        conn = self._read_pool.get()
+        try:
+            yield conn
+        finally:
+            self._read_pool.put(conn)
+
     def _create_table(self):
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             cursor = conn.cursor()
             cursor.execute("""
                 CREATE TABLE IF NOT EXISTS messages (
                     id INTEGER PRIMARY KEY,
-                    message TEXT NOT NULL
+                    sender TEXT NOT NULL DEFAULT 'user',
+                    message TEXT NOT NULL,
+                    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                 )
             """)
-    
-    def log_message(self, message):
-        with sqlite3.connect(self.db_path) as conn:
+            for migration in (
+                "ALTER TABLE messages ADD COLUMN sender TEXT NOT NULL DEFAULT 'user'",
+                "ALTER TABLE messages ADD COLUMN timestamp TIMESTAMP",
+            ):
+                try:
+                    cursor.execute(migration)
+                except sqlite3.OperationalError:
+                    pass # column already exists on databases created with the current schema
+
+            # rows that predate the timestamp column are left NULL by the ALTER,
+            # which would sort indeterminately and never match the retention
+            # cutoff in delete_old_messages; stamp them with the migration time
+            cursor.execute("UPDATE messages SET timestamp = CURRENT_TIMESTAMP WHERE timestamp IS NULL")
+
+            # back filtering by sender and ordering/filtering by time without a
+            # full table scan once the log grows
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_messages_sender_ts ON messages(sender, timestamp DESC)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_messages_ts ON messages(timestamp)")
+
+            # full-text index over message content, kept in sync by triggers so
+            # search is an FTS lookup instead of a LIKE '%...%' table scan
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'messages_fts'")
+            fts_exists = cursor.fetchone() is not None
+            cursor.execute("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts
+                USING fts5(message, content='messages', content_rowid='id')
+            """)
+            cursor.execute("""
+                CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN
+                    INSERT INTO messages_fts(rowid, message) VALUES (new.id, new.message);
+                END
+            """)
+            cursor.execute("""
+                CREATE TRIGGER IF NOT EXISTS messages_fts_delete AFTER DELETE ON messages BEGIN
+                    INSERT INTO messages_fts(messages_fts, rowid, message) VALUES ('delete', old.id, old.message);
+                END
+            """)
+            if not fts_exists:
+                # index any rows logged before the FTS table existed
+                cursor.execute("INSERT INTO messages_fts(messages_fts) VALUES ('rebuild')")
+
+            # materialized per-sender counters, maintained by triggers inside the
+            # same transaction as each insert, so counts and the analytics split
+            # are O(number of senders) lookups instead of full-table aggregates
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'message_counts'")
+            counts_exist = cursor.fetchone() is not None
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS message_counts (
+                    sender TEXT PRIMARY KEY,
+                    n INTEGER NOT NULL
+                )
+            """)
+            cursor.execute("""
+                CREATE TRIGGER IF NOT EXISTS message_counts_insert AFTER INSERT ON messages BEGIN
+                    INSERT INTO message_counts(sender, n) VALUES (new.sender, 1)
+                    ON CONFLICT(sender) DO UPDATE SET n = n + 1;
+                END
+            """)
+            cursor.execute("""
+                CREATE TRIGGER IF NOT EXISTS message_counts_delete AFTER DELETE ON messages BEGIN
+                    UPDATE message_counts SET n = n - 1 WHERE sender = old.sender;
+                END
+            """)
+            if not counts_exist:
+                # seed the counters from rows logged before the table existed;
+                # the upsert keeps this idempotent when several workers race
+                # through initialization against the same legacy database
+                cursor.execute("""
+                    INSERT INTO message_counts(sender, n)
+                    SELECT sender, count(*) FROM messages GROUP BY sender
+                    ON CONFLICT(sender) DO UPDATE SET n = excluded.n
+                """)
+
+    def log_message(self, message, sender="user"):
+        self.log_messages([(sender, message)])
+
+    def log_messages(self, messages):
+        """Queue several (sender, message) pairs for the background writer.
+
+        Returns immediately; each queued batch is written in a single
+        transaction, so both sides of a chat exchange still share one commit.
+        If the writer has fallen so far behind that the queue is full, the batch
+        is dropped with an error rather than blocking the caller or growing
+        memory without bound.
+        """
+        try:
+            self._write_queue.put_nowait(list(messages))
+        except queue.Full:
+            logger.error("Write queue full; dropping a batch of %d message(s)", len(messages))
+
+    def flush(self):
+        """Block until every queued write has been committed."""
+        self._write_queue.join()
+
+    def _process_writes(self):
+        # the writer thread owns one long-lived connection, so inserts stop
+        # paying connection setup per batch
+        conn = self._connect()
+        cursor = conn.cursor()
+
+        while True:
+            # block for one batch, then opportunistically drain whatever else
+            # has queued up behind it so a backlog is committed in a single
+            # transaction (one fsync) instead of one commit per batch
+            rows = list(self._write_queue.get())
+            drained = 1
+            while drained < self.WRITE_COALESCE_LIMIT:
+                try:
+                    rows.extend(self._write_queue.get_nowait())
+                    drained += 1
+                except queue.Empty:
+                    break
+
+            try:
+                cursor.executemany(self._INSERT_SQL, rows)
+                conn.commit()
+                self._history_cache.clear() # cached reads are stale now
+            except sqlite3.Error as e:
+                # a failed log write must never take the writer thread down
+                logger.error("Failed to write message batch: %s", e)
+            finally:
+                for _ in range(drained):
+                    self._write_queue.task_done()
+
+    def get_message_count(self, sender=None):
+        """Return the number of logged messages, optionally for one sender.
+
+        Counts are read from the trigger-maintained message_counts table rather
+        than aggregated over messages; the unfiltered total is additionally
+        cached for a few seconds since it is the common dashboard case.
+        """
+        if sender is None:
+            expires_at, count = self._count_cache
+            if expires_at > time.monotonic():
+                return count
+
+        with self._read_conn() as conn:
             cursor = conn.cursor()
-            cursor.execute("INSERT INTO messages (message) VALUES (?)", (message,))
-            conn.commit()
-    
-    def retrieve_messages(self):
-        with sqlite3.connect(self.db_path) as conn:
+            # the trigger-maintained counters make both variants O(#senders)
+            if sender is None:
+                cursor.execute("SELECT coalesce(sum(n), 0) FROM message_counts")
+            else:
+                cursor.execute("SELECT coalesce(sum(n), 0) FROM message_counts WHERE sender = ?", (sender,))
+            count = cursor.fetchone()[0]
+
+        if sender is None:
+            self._count_cache = (time.monotonic() + self.COUNT_CACHE_TTL, count)
+        return count
+
+    def get_analytics(self, top_n=10):
+        """Simple chatbot analytics: volume, per-sender split, most common queries.
+
+        The aggregates scan the whole table, so the computed payload is held for
+        ANALYTICS_CACHE_TTL seconds and dashboard reads in between are served
+        from memory, keeping their latency independent of the log size.
+        """
+        expires_at, payload = self._analytics_cache
+        if payload is not None and expires_at > time.monotonic():
+            return payload
+
+        with self._read_conn() as conn:
+            cursor = conn.cursor()
+            # one compound statement: the per-sender split comes from the
+            # materialized counters and only the top-N part aggregates over the
+            # table, with a kind column telling the rows apart on the way out
+            cursor.execute(
+                """
+                SELECT 'sender' AS kind, sender AS label, n AS value FROM message_counts
+                UNION ALL
+                SELECT 'top', message, occurrences FROM (
+                    SELECT message, count(*) AS occurrences FROM messages
+                    WHERE sender = 'user' GROUP BY message
+                    ORDER BY occurrences DESC LIMIT ?
+                )
+                """,
+                (top_n,),
+            )
+            by_sender, most_common = {}, []
+            for kind, label, value in cursor.fetchall():
+                if kind == "sender":
+                    by_sender[label] = value
+                else:
+                    most_common.append({"message": label, "occurrences": value})
+            total = sum(by_sender.values())
+
+        payload = {
+            "total_messages": total,
+            "messages_by_sender": by_sender,
+            "most_common_messages": most_common,
+        }
+        self._analytics_cache = (time.monotonic() + self.ANALYTICS_CACHE_TTL, payload)
+        return payload
+
+    def retrieve_messages_with_total(self, limit=200, before_id=None):
+        """Return one page of messages plus the total row count.
+
+        The total comes from the trigger-maintained message_counts table, so it
+        reflects the whole log on every page (a count folded into the page
+        query would only see the rows below the keyset boundary) and costs
+        O(number of senders) instead of a table scan.
+
+        Pagination is keyset-based: pass the id of the last row of the previous
+        page as before_id to get the next one. Unlike OFFSET, which scans and
+        discards the skipped rows, this seeks the primary-key index directly to
+        the page boundary, so deep pages cost the same as the first.
+        """
+        with self._read_conn() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT coalesce(sum(n), 0) FROM message_counts")
+            total = cursor.fetchone()[0]
+            if before_id is None:
+                cursor.execute(
+                    "SELECT id, sender, message, timestamp FROM messages ORDER BY id DESC LIMIT ?",
+                    (limit,),
+                )
+            else:
+                cursor.execute(
+                    "SELECT id, sender, message, timestamp FROM messages WHERE id < ? ORDER BY id DESC LIMIT ?",
+                    (before_id, limit),
+                )
+            rows = cursor.fetchall()
+
+        return rows, total
+
+    def search_messages(self, query, limit=50):
+        """Full-text search over logged messages, best matches first."""
+        with self._read_conn() as conn:
             cursor = conn.cursor()
-            cursor.execute("SELECT id, message FROM messages")
+            cursor.execute(
+                """
+                SELECT m.id, m.sender, m.message, m.timestamp
+                FROM messages_fts JOIN messages m ON m.id = messages_fts.rowid
+                WHERE messages_fts MATCH ? ORDER BY rank LIMIT ?
+                """,
+                (query, limit),
+            )
             return cursor.fetchall()
+
+    def delete_old_messages(self, days=90):
+        """Delete messages older than the given number of days; returns the count.
+
+        The cutoff is computed in Python and bound as a plain timestamp literal,
+        so the WHERE clause is a range scan on idx_messages_ts; wrapping the
+        parameter in DATE('now', ...) inside the SQL would force SQLite to
+        evaluate the date function per row and give up the index. The delete
+        triggers keep the FTS index and the materialized counters in sync.
+        """
+        cutoff = (datetime.now(timezone.utc) - timedelta(days=days)).strftime("%Y-%m-%d %H:%M:%S")
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM messages WHERE timestamp < ?", (cutoff,))
+            deleted = cursor.rowcount
+
+        if deleted:
+            # every cached read may now overcount
+            self._count_cache = (0, 0)
+            self._analytics_cache = (0, None)
+            self._history_cache.clear()
+        return deleted
+
+    def iter_export_for_fine_tuning(self):
+        """Yield the logged exchanges as JSONL lines (bytes), one per user/bot pair.
+
+        Rows are pulled through the sqlite cursor as they are consumed rather
+        than being materialized up front, so memory stays flat no matter how
+        large the log is; callers can stream the lines straight into a file or
+        response body.
+        """
+        with self._read_conn() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT sender, message FROM messages ORDER BY id")
+            pending_user = None
+            for sender, message in cursor:
+                if sender == "user":
+                    pending_user = message
+                elif sender == "bot" and pending_user is not None:
+                    yield orjson.dumps({"messages": [
+                        {"role": "user", "content": pending_user},
+                        {"role": "assistant", "content": message},
+                    ]}) + b"\n"
+                    pending_user = None
+
+    def export_for_fine_tuning(self):
+        """Return the full fine-tuning export as one bytes blob.
+
+        Convenience wrapper over iter_export_for_fine_tuning; large logs should
+        prefer the iterator to avoid holding the whole export in memory.
+        """
+        return b"".join(self.iter_export_for_fine_tuning())
+
+    def retrieve_messages(self, limit=200):
+        """Return the most recent messages as plain tuples.
+
+        The projection is explicit and the result bounded so retrieval cost stays
+        flat instead of growing with the full table; rows come back newest first
+        as (id, sender, message, timestamp) tuples the serializer can encode
+        without any per-row Python object rebuilding. Results are held in memory
+        for a short TTL and dropped as soon as the writer thread commits new
+        rows, so repeat dashboard reads skip sqlite entirely.
+        """
+        cached = self._history_cache.get(limit)
+        if cached and cached[0] > time.monotonic():
+            return cached[1]
+
+        with self._read_conn() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT id, sender, message, timestamp FROM messages ORDER BY id DESC LIMIT ?",
+                (limit,),
+            )
+            rows = cursor.fetchall()
+
+        self._history_cache[limit] = (time.monotonic() + self.HISTORY_CACHE_TTL, rows)
+        return rows
@@ -1,9 +1,33 @@
-import os # not explicitly used but needs to be present
+import os
+import re
 from dotenv import load_dotenv
 from configparser import ConfigParser
 
 load_dotenv()
-parser = ConfigParser()
+
+# the config file doesn't change at runtime, so it is parsed exactly once at
+# import and indexed by model name; constructions then do dict lookups instead
+# of re-reading and re-scanning the file
+def _load_model_properties(path="model_config/model_config.ini"):
+    parser = ConfigParser()
+    parser.read(path)
+    return {section: dict(parser[section]) for section in parser.sections()}
+
+_MODEL_PROPERTIES = _load_model_properties()
+
+# matches the os.getenv("NAME") convention used for api_key in the config file
+_ENV_LOOKUP_RE = re.compile(r"""^os\.getenv\(\s*['"]([A-Za-z_][A-Za-z0-9_]*)['"]\s*\)$""")
+
+def _resolve_api_key(value):
+    """Resolve an api_key config value, without eval'ing arbitrary code.
+
+    Values written as os.getenv("NAME") are looked up in the environment;
+    anything else is taken as the literal key.
+    """
+    match = _ENV_LOOKUP_RE.match(value.strip())
+    if match:
+        return os.getenv(match.group(1))
+    return value
 
 class ModelConfig():
     def __init__(self, provider_name, model_name, tokenizer, completion, use_initial_prompt):
@@ -20,60 +44,42 @@ class ModelConfig():
 
         self.use_initial_prompt = use_initial_prompt
         
-        model_match_found = False
-        parser.read("model_config/model_config.ini")
-        self.available_models = list(parser.sections())
+        self.available_models = list(_MODEL_PROPERTIES)
 
         if not self.available_models:
             raise ValueError("You haven\'t specified any models in the configuration file!")
-            
-        for model in self.available_models:
-
-            provider = parser[model]["provider"]
-
-            # if the model specified in the config file matches the model passed in as a param
-            if model == model_name:
-                # if the provider specified in the config file matches the provider passed in as a param
-                if provider == provider_name:
-                    model_match_found = True
-
-                    # updating the current provider and model
-                    self.active_provider = provider_name
-                    self.active_model = model_name
-
-                    properties = parser[model] # extracting this matched model's properties
-
-                    # updating model completion parameters if existent
-                    if "max_output_tokens" in properties:
-                        self.default_max_tokens = int(properties["max_output_tokens"])
-                    if "temperature" in properties:
-                        self.default_temperature = float(properties["temperature"])
-                        
-                    # updating API key if existent
-                    if "api_key" not in properties:
-                        raise ValueError(f"A key with the name of \"api_key\" must be supplied for {model_name}")
-                    else:
-                        try:
-                            self.API_KEY = eval(properties["api_key"])
-                        except NameError:  
-                            self.API_KEY = properties["api_key"]
-                        
-                    # updating context window if it exists
-                    if "context_length" not in properties:
-                        raise ValueError(f"A key with the name of \"context_length\" must be supplied for {model_name}")
-                    else:
-                        self.context_length = int(properties["context_length"])
-                        
-                    break
-                
-                # we found a matching model but the provider doesn't match
-                else:
-                    raise ValueError(f"{model_name} isn't supported for {provider_name}. Please select another one and try again.")
-
-        # the model itself is non-existent  
-        if not model_match_found:
+
+        # the pre-built index makes the lookup a hash probe instead of a scan
+        properties = _MODEL_PROPERTIES.get(model_name)
+
+        # the model itself is non-existent
+        if properties is None:
             raise ValueError(f"{model_name} is non-existent. Please select a different one and try again.")
 
+        # we found a matching model but the provider doesn't match
+        if properties["provider"] != provider_name:
+            raise ValueError(f"{model_name} isn't supported for {provider_name}. Please select another one and try again.")
+
+        # updating the current provider and model
+        self.active_provider = provider_name
+        self.active_model = model_name
+
+        # updating model completion parameters if existent
+        if "max_output_tokens" in properties:
+            self.default_max_tokens = int(properties["max_output_tokens"])
+        if "temperature" in properties:
+            self.default_temperature = float(properties["temperature"])
+
+        # updating API key if existent
+        if "api_key" not in properties:
+            raise ValueError(f"A key with the name of \"api_key\" must be supplied for {model_name}")
+        self.API_KEY = _resolve_api_key(properties["api_key"])
+
+        # updating context window if it exists
+        if "context_length" not in properties:
+            raise ValueError(f"A key with the name of \"context_length\" must be supplied for {model_name}")
+        self.context_length = int(properties["context_length"])
+
     def get_model_info(self):
         return [self.active_provider, self.active_model, self.context_length]
 
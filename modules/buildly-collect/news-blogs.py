@@ -1,37 +1,64 @@
+import time
+
 import feedparser
 
 url = "https://www.buildly.io/news/feed/"
 
+# the feed changes at most hourly, so keep the parsed entries around for a while
+# instead of re-downloading and re-parsing the XML on every request
+FEED_CACHE_TTL = 300
+_feed_cache = {} # rss_url -> (expires_at, etag, modified, entries)
+
+def fetch_feed_entries(rss_url):
+    """Return the parsed entries for a feed, cached for FEED_CACHE_TTL seconds.
+
+    Once the TTL lapses, the feed's ETag/Last-Modified validators from the
+    previous fetch are sent along, so an unchanged feed comes back as a 304
+    with no body to download or re-parse and the cached entries are kept.
+    """
+    now = time.monotonic()
+    cached = _feed_cache.get(rss_url)
+    if cached and cached[0] > now:
+        return cached[3]
+
+    etag, modified = (cached[1], cached[2]) if cached else (None, None)
+    feed = feedparser.parse(rss_url, etag=etag, modified=modified)
+
+    if cached and feed.get("status") == 304:
+        # unchanged upstream: keep the parsed entries, just refresh the TTL
+        _feed_cache[rss_url] = (now + FEED_CACHE_TTL, cached[1], cached[2], cached[3])
+        return cached[3]
+
+    _feed_cache[rss_url] = (now + FEED_CACHE_TTL, feed.get("etag"),
+                            feed.get("modified"), feed.entries)
+    return feed.entries
+
 def fetch_and_format_rss_feed(url):
-    # Parse the RSS feed
-    feed = feedparser.parse(url)
     prompts = []
-    
-    for entry in feed.entries:
+
+    for entry in fetch_feed_entries(url):
         # Create a prompt based on the article's title and a summary
         prompt = {
             'title': entry.title,
             'prompt': f"Generate a summary for the following article titled '{entry.title}': {entry.summary}"
         }
         prompts.append(prompt)
-    
+
     return prompts
 
 
 
 def search_rss_feed(url, keyword):
-    # Parse the RSS feed
-    feed = feedparser.parse(url)
     filtered_articles = []
-    
-    for entry in feed.entries:
+    keyword = keyword.lower()
+
+    for entry in fetch_feed_entries(url):
         # Check if the keyword is in the title or summary
-        if keyword.lower() in entry.title.lower() or keyword.lower() in entry.summary.lower():
+        if keyword in entry.title.lower() or keyword in entry.summary.lower():
             article_info = {
                 'title': entry.title,
                 'link': entry.link
             }
             filtered_articles.append(article_info)
-    
-    return filtered_articles
 
+    return filtered_articles
@@ -19,17 +19,22 @@ class FineTuningConfig(Enum):
     PROMPTS_FILE = "prompts_file"  # Path to the file containing prompts (if applicable)
 
 
+# the enum members never change at runtime, so materialize their values once
+# instead of walking the enum protocol on every lookup
+_CONFIG_OPTION_VALUES = tuple(option.value for option in FineTuningConfig)
+
+
 def get_config_from_env_vars():
     """
     Retrieves fine-tuning configuration from environment variables.
     """
 
     config = {}
-    for option in FineTuningConfig:
-        value = os.environ.get(option.value)
+    for option_value in _CONFIG_OPTION_VALUES:
+        value = os.environ.get(option_value)
         if not value:
-            raise ValueError(f"Environment variable '{option.value}' not set")
-        config[option.value] = value
+            raise ValueError(f"Environment variable '{option_value}' not set")
+        config[option_value] = value
     return config
 
 
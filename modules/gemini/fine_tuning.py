@@ -1,8 +1,5 @@
 import os
-import vertexai as vertexai_sdk  # Assuming Vertex AI SDK
-
 import re
-import pandas as pd
 
 def anonymize_data(data_path, product_id):
     """
@@ -16,7 +13,10 @@ def anonymize_data(data_path, product_id):
         pandas.DataFrame: The anonymized and preprocessed data.
     """
 
-    # Load data using pandas (replace with your format handler if needed)
+    # Load data using pandas (replace with your format handler if needed);
+    # imported lazily so merely importing this module stays cheap
+    import pandas as pd
+
     data = pd.read_csv(data_path)
 
     # Regular expressions for anonymization (customize based on data format)
@@ -124,5 +124,6 @@ def main():
     epochs = 10
     learning_rate = 0.001
 
-    training_data = prepare_data(data_path, product_id)
-    fine_tuned_model =
+    training_data = prepare_data_for_fine_tuning(data_path, product_id)
+    fine_tuned_model = fine_tune_model(base_model_name, training_data, epochs, learning_rate)
+    return fine_tuned_model
@@ -67,44 +67,79 @@ $(document).ready(function () {
     let sessionNumTokens = sessionStorage.getItem("totalUsedTokens");
     let localNumTokens = sessionNumTokens ? JSON.parse(sessionNumTokens) : 0;
 
-    $.ajax({
-      url: '/chatbot',
-      type: 'POST',
-      contentType: 'application/json',
-      data: JSON.stringify({prompt: userMessage, history: localMessageHistory, tokens: localNumTokens}),
-      success: function (data) {
-        const {response: botMessage, usedTokens, updatedHistory} = data;
-
-        if (botMessage !== "Sorry... An error occurred.") {
-          // update client side with number of used tokens(included tokens used for the last user query and bot response)
-          sessionStorage.setItem("totalUsedTokens", JSON.stringify(usedTokens));
-          
-          // if chat history was truncated because of token limit exceeded, needs to be updated on client side as well
-          if (updatedHistory !== null) {
-            localMessageHistory = updatedHistory;
-            sessionStorage.setItem("messageHistory", JSON.stringify(localMessageHistory));
+    function handleFinalEvent(event, botMessage) {
+      // update client side with number of used tokens(included tokens used for the last user query and bot response)
+      sessionStorage.setItem("totalUsedTokens", JSON.stringify(event.usedTokens));
+
+      // if chat history was truncated because of token limit exceeded, needs to be updated on client side as well
+      if (event.updatedHistory !== null) {
+        localMessageHistory = event.updatedHistory;
+        sessionStorage.setItem("messageHistory", JSON.stringify(localMessageHistory));
+      }
+
+      // update chat history
+      localMessageHistory["user"].push(userMessage);
+      localMessageHistory["bot"].push(botMessage);
+      sessionStorage.setItem("messageHistory", JSON.stringify(localMessageHistory));
+    }
+
+    // the server streams the response as newline-delimited JSON events, so the bot
+    // message can be rendered incrementally instead of after the full generation
+    fetch('/chatbot', {
+      method: 'POST',
+      headers: {'Content-Type': 'application/json'},
+      body: JSON.stringify({prompt: userMessage, history: localMessageHistory, tokens: localNumTokens})
+    })
+    .then(async (response) => {
+      const messageContainer = $('<div class="message bot-message"></div>');
+      const messageText = $('<p></p>');
+      messageContainer.append(messageText);
+      chatMessages.append(messageContainer);
+
+      // the error path still responds with a plain JSON body
+      if (!response.headers.get('Content-Type').includes('application/x-ndjson')) {
+        const data = await response.json();
+        messageText.text(data.response);
+        return;
+      }
+
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffered = '';
+      let botMessage = '';
+
+      while (true) {
+        const {done, value} = await reader.read();
+        if (done) break;
+
+        buffered += decoder.decode(value, {stream: true});
+        const lines = buffered.split('\n');
+        buffered = lines.pop(); // keep any trailing partial event for the next read
+
+        for (const line of lines) {
+          if (line.trim() === '') continue;
+          const event = JSON.parse(line);
+
+          if (event.delta) {
+            botMessage += event.delta;
+            messageText.text(botMessage);
+            chatMessages.scrollTop(chatMessages.prop('scrollHeight'));
+          } else if (event.error) {
+            messageText.text(event.error);
+          } else if (event.done) {
+            handleFinalEvent(event, botMessage);
           }
-          
-          // update chat history
-          localMessageHistory["user"].push(userMessage);
-          localMessageHistory["bot"].push(botMessage);
-          sessionStorage.setItem("messageHistory", JSON.stringify(localMessageHistory));
         }
-
-        const messageContainer = $('<div class="message bot-message"></div>');
-        const messageText = $('<p></p>').text(botMessage);
-        messageContainer.append(messageText);
-        chatMessages.append(messageContainer);
-
-        chatMessages.scrollTop(chatMessages.prop('scrollHeight'));
-      },
-      error: function (error) {
-        console.error('Error:', error);
-      },
-      complete: function() {
-        disable_form(false)
-        document.getElementById("loader").remove()
       }
+
+      chatMessages.scrollTop(chatMessages.prop('scrollHeight'));
+    })
+    .catch((error) => {
+      console.error('Error:', error);
+    })
+    .finally(() => {
+      disable_form(false)
+      document.getElementById("loader").remove()
     });
   }
 });
\ No newline at end of file
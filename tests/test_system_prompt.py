@@ -0,0 +1,41 @@
+import os
+import tempfile
+
+# configure credentials, a scratch prompt file and a scratch database before
+# main is imported, since all three are resolved at import time; the db path
+# in particular keeps test runs from dropping sqlite files in the repo root
+os.environ["ADMIN_USERNAME"] = "admin"
+os.environ["ADMIN_PASSWORD"] = "secret"
+_scratch_dir = tempfile.mkdtemp()
+_prompt_path = os.path.join(_scratch_dir, "initial-prompt.txt")
+with open(_prompt_path, "w") as prompt_file:
+    prompt_file.write("original prompt")
+os.environ["INITIAL_PROMPT_FILE_PATH"] = _prompt_path
+os.environ["CHATBOT_DB_PATH"] = os.path.join(_scratch_dir, "chatbot.db")
+
+from fastapi.testclient import TestClient
+
+import main
+
+client = TestClient(main.app)
+
+
+def test_system_prompt_requires_credentials():
+    assert client.get("/system_prompt").status_code == 401
+    assert client.post("/system_prompt", json={"prompt": "x"}).status_code == 401
+
+
+def test_update_system_prompt_replaces_file_and_keeps_backup():
+    response = client.post("/system_prompt", json={"prompt": "updated prompt"},
+                           auth=("admin", "secret"))
+    assert response.status_code == 200
+    assert response.json() == {"status": "updated"}
+
+    with open(_prompt_path) as prompt_file:
+        assert prompt_file.read() == "updated prompt"
+    with open(f"{_prompt_path}.backup") as backup_file:
+        assert backup_file.read() == "original prompt"
+    assert not os.path.exists(f"{_prompt_path}.tmp")
+
+    response = client.get("/system_prompt", auth=("admin", "secret"))
+    assert response.json() == {"prompt": "updated prompt"}